@@ -4,66 +4,198 @@ Convert markdown patent files to clean plain text format.
 Removes all markdown syntax while preserving content structure.
 """
 
+import json
+import mmap
+import os
 import re
+import zlib
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
+# Build cache shared with make_pdfs.py: skips outputs whose source and
+# builder script are both unchanged.
+CACHE_FILE = '.convert_cache.json'
+
+# Patterns compiled once at import time. Markdown syntax is pure ASCII, so
+# re.ASCII keeps \s and \w on the byte-table fast path instead of Unicode
+# category lookups.
+_RE_TABLE = re.compile(r'(?:^\|.+\|$\n){2,}', re.MULTILINE | re.ASCII)
+_RE_BLANKS = re.compile(r'\n{3,}', re.ASCII)
+
+# Line-level rules: headers run before the inline passes, rules and
+# bullets after them (the original order).
+_RE_HEADER = re.compile(r'^#{1,6}\s+', re.MULTILINE | re.ASCII)
+_RE_HRULE = re.compile(r'^---+\s*$', re.MULTILINE | re.ASCII)
+_RE_BULLET = re.compile(r'^\s*[-\*]\s+', re.MULTILINE | re.ASCII)
+
+# Inline passes, in order: bold before italic so ***x*** loses both markers,
+# both before code so markup inside backticks is stripped too.
+_RE_BOLD = re.compile(r'\*\*(.*?)\*\*', re.ASCII)
+_RE_ITALIC = re.compile(r'(?<!\w)\*(.*?)\*(?!\w)', re.ASCII)
+_RE_CODEBLOCK = re.compile(r'```.*?```', re.DOTALL | re.ASCII)
+_RE_INLINE_CODE = re.compile(r'`(.*?)`', re.ASCII)
+
+
 def convert_table(match):
     """Convert a markdown table to plain text list format."""
     lines = match.group(0).strip().split('\n')
     # Parse header row
     headers = [h.strip() for h in lines[0].strip('|').split('|')]
-    # Skip separator row (line 1), process data rows
-    rows = []
-    for line in lines[2:]:
-        cells = [c.strip() for c in line.strip('|').split('|')]
-        rows.append(cells)
-    # Format as list entries
-    result = []
-    for row in rows:
-        parts = []
-        for h, c in zip(headers, row):
-            if c:
-                parts.append(f"{h}: {c}")
-        result.append(' — '.join(parts))
-    return '\n'.join(result)
+    # Skip separator row (line 1); each data row becomes one list entry,
+    # joined straight into the result without intermediate row lists
+    return '\n'.join(
+        ' — '.join(
+            f"{h}: {c}"
+            for h, c in zip(headers, (c.strip() for c in line.strip('|').split('|')))
+            if c
+        )
+        for line in lines[2:]
+    )
 
 
 def clean_markdown(text):
     """Remove all markdown formatting from text."""
 
+    # Each pass is skipped when the text has none of the characters it
+    # needs, so plain runs of text never enter the regex engine.
+
     # Convert markdown tables to plain text before other processing
-    text = re.sub(
-        r'(?:^\|.+\|$\n){2,}',
-        convert_table,
-        text,
-        flags=re.MULTILINE
-    )
+    if '|' in text:
+        text = _RE_TABLE.sub(convert_table, text)
 
     # Remove markdown headers (###, ####, etc.) - keep just the text
-    text = re.sub(r'^#{1,6}\s+', '', text, flags=re.MULTILINE)
-
-    # Remove bold/italic markers (but NOT multiplication asterisks like f_1*t)
-    text = re.sub(r'\*\*(.*?)\*\*', r'\1', text)
-    text = re.sub(r'(?<!\w)\*(.*?)\*(?!\w)', r'\1', text)
-
-    # Remove code blocks
-    text = re.sub(r'```.*?```', '', text, flags=re.DOTALL)
-    text = re.sub(r'`(.*?)`', r'\1', text)
+    if '#' in text:
+        text = _RE_HEADER.sub('', text)
+
+    # Remove bold/italic markers (but NOT multiplication asterisks like f_1*t).
+    # Separate passes, so nested markup (***x***, **a *b* c**) is fully removed
+    if '**' in text:
+        text = _RE_BOLD.sub(r'\1', text)
+    if '*' in text:
+        text = _RE_ITALIC.sub(r'\1', text)
+
+    # Remove code blocks, then inline code
+    if '```' in text:
+        text = _RE_CODEBLOCK.sub('', text)
+    if '`' in text:
+        text = _RE_INLINE_CODE.sub(r'\1', text)
 
     # Remove horizontal rules
-    text = re.sub(r'^---+\s*$', '', text, flags=re.MULTILINE)
+    if '---' in text:
+        text = _RE_HRULE.sub('', text)
 
     # Convert bullet lists - keep the content but clean up
-    text = re.sub(r'^\s*[-\*]\s+', '', text, flags=re.MULTILINE)
+    if '-' in text or '*' in text:
+        text = _RE_BULLET.sub('', text)
 
     # Remove multiple blank lines
-    text = re.sub(r'\n{3,}', '\n\n', text)
+    if '\n\n\n' in text:
+        text = _RE_BLANKS.sub('\n\n', text)
 
     # Trim whitespace
     text = text.strip()
 
     return text
 
+
+def source_digest(data):
+    """CRC-32 of a bytes-like object (computed in C, no per-byte Python loop)."""
+    return zlib.crc32(data)
+
+
+def script_digest(path):
+    """source_digest of a builder script, so editing it invalidates its outputs."""
+    return source_digest(Path(path).read_bytes())
+
+
+def load_cache(path):
+    """Load the build cache, or an empty one if missing or unreadable."""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_cache(cache, path):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(cache, f, indent=2, sort_keys=True)
+
+
+def is_up_to_date(cache, source, output, builder):
+    """True if output was built from the current content of source.
+
+    builder is the script_digest of the script that builds output: outputs
+    of an older version of the converter are never up to date. The source
+    is only hashed when its mtime changed since the last build, so a
+    touched-but-identical file is still recognised as up to date.
+    """
+    entry = cache.get(f"{source} -> {output}")
+    if entry is None or not output.exists():
+        return False
+    if entry.get('builder') != builder:
+        return False
+    if output.stat().st_mtime != entry['output_mtime']:
+        return False
+    mtime = source.stat().st_mtime
+    if mtime == entry['mtime']:
+        return True
+    if source_digest(source.read_bytes()) != entry['hash']:
+        return False
+    entry['mtime'] = mtime
+    return True
+
+
+def record_build(cache, source, output, builder, digest=None):
+    """Remember that output was just built from source by builder.
+
+    digest is the source_digest of the source bytes, if the caller already
+    has it.
+    """
+    if digest is None:
+        digest = source_digest(source.read_bytes())
+    cache[f"{source} -> {output}"] = {
+        'mtime': source.stat().st_mtime,
+        'hash': digest,
+        'builder': builder,
+        'output_mtime': output.stat().st_mtime,
+    }
+
+
+def read_source(path):
+    """Read a UTF-8 source file through a read-only memory map.
+
+    Hashing and decoding both work on the mapped pages, so the raw bytes are
+    never copied into an intermediate buffer. Returns (text, source_digest).
+    """
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return '', source_digest(b'')  # empty files cannot be mapped
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm, \
+                memoryview(mm) as view:
+            digest = source_digest(view)
+            text = str(view, 'utf-8')
+    # Same newline handling as text-mode open()
+    if '\r' in text:
+        text = text.replace('\r\n', '\n').replace('\r', '\n')
+    return text, digest
+
+
+def convert_file(source_file, output_file):
+    """Convert one markdown source to clean text; returns the source hash."""
+    # Read source
+    content, digest = read_source(source_file)
+
+    # Clean markdown
+    clean_content = clean_markdown(content)
+
+    # Write output
+    with open(output_file, 'w', encoding='utf-8') as f:
+        f.write(clean_content)
+
+    return digest
+
+
 def main():
     source_dir = Path('../source')
     output_dir = Path('.')
@@ -75,25 +207,34 @@ def main():
         ('rivendicazioni.md', 'rivendicazioni_en_clean.txt'),
     ]
 
+    cache_path = output_dir / CACHE_FILE
+    cache = load_cache(cache_path)
+    builder = script_digest(__file__)
+
+    pending = []
     for source_name, output_name in files_to_convert:
         source_file = source_dir / source_name
         if not source_file.exists():
             print(f"Skipping {source_name} - not found")
             continue
 
-        # Read source
-        with open(source_file, 'r', encoding='utf-8') as f:
-            content = f.read()
-
-        # Clean markdown
-        clean_content = clean_markdown(content)
-
-        # Write output
         output_file = output_dir / output_name
-        with open(output_file, 'w', encoding='utf-8') as f:
-            f.write(clean_content)
-
-        print(f"  {source_name} -> {output_name}")
+        if is_up_to_date(cache, source_file, output_file, builder):
+            print(f"  {source_name} -> {output_name} (up to date)")
+            continue
+        pending.append((source_file, output_file))
+
+    # Files are independent and written to distinct paths: convert them
+    # in parallel, one process each.
+    if pending:
+        sources, outputs = zip(*pending)
+        with ProcessPoolExecutor(max_workers=len(pending)) as pool:
+            for source_file, output_file, digest in zip(
+                    sources, outputs, pool.map(convert_file, sources, outputs)):
+                record_build(cache, source_file, output_file, builder, digest)
+                print(f"  {source_file.name} -> {output_file.name}")
+
+    save_cache(cache, cache_path)
 
 if __name__ == '__main__':
     main()
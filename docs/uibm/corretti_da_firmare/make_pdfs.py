@@ -1,13 +1,22 @@
 #!/usr/bin/env python3
 """Create PDFs from text files using reportlab."""
 
+import html
+import re
 from reportlab.lib.pagesizes import A4
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import cm
 from reportlab.lib.enums import TA_JUSTIFY
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
+from convert_clean import (CACHE_FILE, load_cache, save_cache, is_up_to_date,
+                           record_build, script_digest)
+
+# Blank (or whitespace-only) lines separate paragraphs.
+_RE_PARAGRAPH_BREAK = re.compile(r'\n\s*\n')
+
 def create_pdf(text_file, pdf_file):
     with open(text_file, 'r', encoding='utf-8') as f:
         content = f.read()
@@ -20,23 +29,47 @@ def create_pdf(text_file, pdf_file):
     style = ParagraphStyle('Custom', parent=styles['Normal'],
                           fontSize=10, leading=14, alignment=TA_JUSTIFY)
 
+    # Escape the whole text once, then emit one Paragraph per block of
+    # consecutive lines (kept apart with <br/>) instead of one per line:
+    # layout cost grows with the number of flowables.
+    content = html.escape(content, quote=False)
     story = []
-    for line in content.split('\n'):
-        if line.strip():
-            line = line.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
-            story.append(Paragraph(line, style))
-        else:
+    for block in _RE_PARAGRAPH_BREAK.split(content):
+        if story:
             story.append(Spacer(1, 0.3*cm))
+        if block.strip():
+            story.append(Paragraph(block.strip('\n').replace('\n', '<br/>'), style))
 
     doc.build(story)
-    print(f"  {pdf_file}")
 
-files = [
+FILES = [
     ('descrizione_clean.txt', 'descrizione_FINAL.pdf'),
     ('rivendicazioni_clean.txt', 'rivendicazioni_FINAL.pdf'),
     ('riassunto_clean.txt', 'riassunto_FINAL.pdf'),
     ('rivendicazioni_en_clean.txt', 'rivendicazioni_en_FINAL.pdf'),
 ]
 
-for txt, pdf in files:
-    create_pdf(txt, pdf)
+
+def main():
+    cache = load_cache(CACHE_FILE)
+    builder = script_digest(__file__)
+    pending = []
+    for txt, pdf in FILES:
+        if is_up_to_date(cache, Path(txt), Path(pdf), builder):
+            print(f"  {pdf} (up to date)")
+            continue
+        pending.append((txt, pdf))
+
+    # Each PDF is built independently (reportlab layout is CPU-bound):
+    # one worker process per file.
+    if pending:
+        txts, pdfs = zip(*pending)
+        with ProcessPoolExecutor(max_workers=len(pending)) as pool:
+            for txt, pdf, _ in zip(txts, pdfs, pool.map(create_pdf, txts, pdfs)):
+                record_build(cache, Path(txt), Path(pdf), builder)
+                print(f"  {pdf}")
+    save_cache(cache, CACHE_FILE)
+
+
+if __name__ == '__main__':
+    main()
@@ -13,6 +13,8 @@ import sys
 import os
 import math
 
+import numpy as np
+
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
 from triphase_sim import simple_system, m1_max_system
 
@@ -30,6 +32,9 @@ def visualize_beat(f_alpha: float = 5.0, f_beta: float = 3.0,
     print()
 
     width = resolution
+    center = width // 2
+    blank = [' '] * width
+    blank[center] = '|'  # center marker
     steps = 200
     dt = duration / steps
 
@@ -39,10 +44,8 @@ def visualize_beat(f_alpha: float = 5.0, f_beta: float = 3.0,
 
         # Map to display position [0, width)
         pos = int((phi + 0.5) * width) % width
-        center = width // 2
 
-        line = list(' ' * width)
-        line[center] = '|'  # center marker
+        line = blank.copy()
 
         is_sync = abs(phi) < 0.05
         char = '*' if is_sync else '.'
@@ -68,42 +71,37 @@ def visualize_torus(f1: float = 5.0, f2: float = 3.0, f3: float = 2.0,
     print()
 
     grid_size = 40
-    grid = [[' ' for _ in range(grid_size)] for _ in range(grid_size)]
+    # One byte per cell; the whole trajectory is plotted in array passes
+    grid = np.full((grid_size, grid_size), ord(' '), dtype=np.uint8)
+    last = grid_size - 1  # phase -> cell scale, also the clamp bound
 
     steps = 500
-    dt = duration / steps
-    sync_count = 0
-
-    for i in range(steps):
-        t = i * dt
-        phi_ab = sys_clk.phase_ab(t)  # [-0.5, 0.5)
-        phi_ao = sys_clk.phase_ao(t)  # [-0.5, 0.5)
+    t = np.arange(steps) * (duration / steps)
+    phi_ab = sys_clk.phase_ab_vec(t)  # [-0.5, 0.5)
+    phi_ao = sys_clk.phase_ao_vec(t)  # [-0.5, 0.5)
 
-        x = int((phi_ab + 0.5) * (grid_size - 1))
-        y = int((phi_ao + 0.5) * (grid_size - 1))
-        x = max(0, min(grid_size - 1, x))
-        y = max(0, min(grid_size - 1, y))
+    xs = np.clip(((phi_ab + 0.5) * last).astype(int), 0, last)
+    ys = np.clip(((phi_ao + 0.5) * last).astype(int), 0, last)
 
-        is_sync = abs(phi_ab) < 0.05 and abs(phi_ao) < 0.05
-        if is_sync:
-            grid[y][x] = '*'
-            sync_count += 1
-        elif grid[y][x] == ' ':
-            grid[y][x] = '.'
+    # Sync points overwrite plain trajectory points, never the reverse
+    is_sync = (np.abs(phi_ab) < 0.05) & (np.abs(phi_ao) < 0.05)
+    grid[ys, xs] = ord('.')
+    grid[ys[is_sync], xs[is_sync]] = ord('*')
+    sync_count = int(np.count_nonzero(is_sync))
 
     # Print grid
     print(f"  Φ_AO")
     print(f"  +0.5 {'─' * grid_size}┐")
     for row in range(grid_size):
         label = f"       " if row != grid_size // 2 else f"   0.0 "
-        print(f"  {label}│{''.join(grid[row])}│")
+        print(f"  {label}│{grid[row].tobytes().decode('ascii')}│")
     print(f"  -0.5 {'─' * grid_size}┘")
     print(f"       -0.5{' ' * (grid_size - 8)}+0.5")
     print(f"                    Φ_AB")
     print(f"\n  Sync points found: {sync_count}/{steps}")
 
     # Density analysis
-    filled = sum(1 for row in grid for c in row if c != ' ')
+    filled = int(np.count_nonzero(grid != ord(' ')))
     coverage = filled / (grid_size * grid_size)
     print(f"  Phase space coverage: {coverage*100:.1f}%")
     print(f"  (Ergodic trajectory fills more space over time)")
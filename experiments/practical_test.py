@@ -16,12 +16,14 @@ import os
 import time
 import math
 
+import numpy as np
+
 # Add parent to path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
 from triphase_sim import (
     Clock, TriphaseSystem, PhaseRegister,
     PhaseWeightedALU, TriphaseVM, PhaseInstruction,
-    simple_system, m1_max_system
+    simple_system, m1_max_system, njit
 )
 
 
@@ -111,20 +113,35 @@ def test_phase_memory():
 # Test 3: Hidden Parallelism — 1 stream, N computations
 # =============================================================================
 
+@njit('void(int64[:], int64[:, :])', cache=True)
+def _run_phase_ops(slots, history):
+    """
+    Un accumulatore per fase; al tick i esegue l'op dello slot slots[i]:
+    0 → +1, 1 → +2, 2 → *2+1, 3 → +10. history[i] = stato dopo il tick i.
+    """
+    acc = np.zeros(4, dtype=np.int64)
+    for i in range(slots.shape[0]):
+        slot = slots[i]
+        if slot == 0:
+            acc[0] += 1
+        elif slot == 1:
+            acc[1] += 2
+        elif slot == 2:
+            acc[2] = acc[2] * 2 + 1
+        else:
+            acc[3] += 10
+        history[i, :] = acc
+
+
 def test_hidden_parallelism():
     separator("TEST 3: Hidden Parallelism")
 
     # Observer at 13 Hz (prime) to sample across all phase slots
     sys_clk = simple_system(4.0, 1.0, 13.0)
 
-    # 4 accumulatori, uno per fase
-    accumulators = [0] * 4
-    ops = [
-        lambda a: a + 1,      # fase 0: incrementa
-        lambda a: a + 2,      # fase 1: aggiungi 2
-        lambda a: a * 2 + 1,  # fase 2: raddoppia+1
-        lambda a: a + 10,     # fase 3: aggiungi 10
-    ]
+    # 4 accumulatori, uno per fase; op codificate come opcode = slot
+    # (vedi _run_phase_ops)
+    num_accumulators = 4
     op_names = ["+1", "+2", "*2+1", "+10"]
 
     dt = 1.0 / sys_clk.observer.frequency_hz
@@ -137,18 +154,23 @@ def test_hidden_parallelism():
     print(f"  {'Tick':>4} | {'Phase':>5} | {'Op':>6} | Accumulators")
     print(f"  {'----':>4}-+-{'-----':>5}-+-{'------':>6}-+-{'-'*30}")
 
-    for i in range(num_ticks):
-        t = i * dt
-        phi = sys_clk.alpha.phase_at(t)
-        slot = int(phi * 4) % 4
-
-        accumulators[slot] = ops[slot](accumulators[slot])
-
-        print(f"  {i+1:4d} | {phi:5.2f} | {op_names[slot]:>6} | {accumulators}")
+    # Fasi e slot di tutti i tick in un passaggio, poi le op in un kernel
+    t = np.arange(num_ticks) * dt
+    phi = (t * sys_clk.alpha.frequency_hz) % 1.0
+    slots = (phi * num_accumulators).astype(np.int64) % num_accumulators
+    history = np.empty((num_ticks, num_accumulators), dtype=np.int64)
+    _run_phase_ops(slots, history)
+
+    rows = [
+        f"  {i+1:4d} | {p:5.2f} | {op_names[slot]:>6} | {accumulators}"
+        for i, (p, slot, accumulators) in enumerate(
+            zip(phi.tolist(), slots.tolist(), history.tolist()))
+    ]
+    print("\n".join(rows))
 
     print(f"\n  Sequential ticks: {num_ticks}")
-    print(f"  Independent computations: {len(accumulators)}")
-    print(f"  Parallelism factor: {len(accumulators)}x (from 1 stream)")
+    print(f"  Independent computations: {num_accumulators}")
+    print(f"  Parallelism factor: {num_accumulators}x (from 1 stream)")
 
 
 # =============================================================================
@@ -172,13 +194,15 @@ def test_phase_weighted():
     print(f"  {'Tick':>4} | {'Φ_AB':>7} | {'Result':>10} | {'Deviation':>10}")
     print(f"  {'----':>4}-+-{'-------':>7}-+-{'----------':>10}-+-{'----------':>10}")
 
+    rows = []
     for i in range(15):
         t = i * dt
         r = alu.add(a, b, t)
         phi = sys_clk.phase_ab(t)
         dev = r - (a + b)
         results.append(r)
-        print(f"  {i+1:4d} | {phi:+.4f} | {r:10.2f} | {dev:+10.2f}")
+        rows.append(f"  {i+1:4d} | {phi:+.4f} | {r:10.2f} | {dev:+10.2f}")
+    print("\n".join(rows))
 
     unique = len(set(f"{r:.6f}" for r in results))
     print(f"\n  Unique results from same input: {unique}/15")
@@ -202,14 +226,14 @@ def test_phase_crypto():
     dt = 1.0 / sys_clk.observer.frequency_hz
     num_attempts = 100
 
+    half_width = window_width / 2
+
     successes = 0
     for i in range(num_attempts):
         t = i * dt
         phi = sys_clk.phase_ab(t)
         dist = abs(phi - window_center)
-        if dist > 0.5:
-            dist = 1.0 - dist
-        if dist <= window_width / 2:
+        if min(dist, 1.0 - dist) <= half_width:
             successes += 1
 
     access_rate = successes / num_attempts
@@ -236,14 +260,14 @@ def test_vm_demo():
     #            conta tick in r1 sempre
 
     def op_accumulate(vm, t):
-        current = vm.registers["r0"].slots[0].value
-        vm.registers["r0"].slots[0].value = current + 10
-        return f"r0 += 10 → {current + 10}"
+        current = vm.registers["r0"].read_slot(0)
+        vm.registers["r0"].write_slot(0, current + 10)
+        return f"r0 += 10 → {current + 10:g}"
 
     def op_count(vm, t):
-        current = vm.registers["r1"].slots[0].value
-        vm.registers["r1"].slots[0].value = current + 1
-        return f"r1++ → {current + 1}"
+        current = vm.registers["r1"].read_slot(0)
+        vm.registers["r1"].write_slot(0, current + 1)
+        return f"r1++ → {current + 1:g}"
 
     program = [
         PhaseInstruction("ab", 0.0, 0.2, op_accumulate, "SYNC_ADD"),
@@ -260,16 +284,37 @@ def test_vm_demo():
     print(f"  {'Tick':>4} | {'Φ_AB':>7} | {'Sync':>5} | Executed")
     print(f"  {'----':>4}-+-{'-------':>7}-+-{'-----':>5}-+-{'--------'}")
 
+    rows = []
     for r in results[:20]:
         phi_ab = r["phases"][0]
         sync = "YES" if r["sync"] else ""
         ops = ", ".join(e["op"] for e in r["executed"]) if r["executed"] else "-"
-        print(f"  {r['tick']:4d} | {phi_ab:+.4f} | {sync:>5} | {ops}")
-
-    r0 = vm.registers["r0"].slots[0].value
-    r1 = vm.registers["r1"].slots[0].value
-    print(f"\n  Final: r0={r0} (sync-gated), r1={r1} (ungated)")
-    print(f"  Ratio: r0 advanced {r0//10} times in {r1} ticks")
+        rows.append(f"  {r['tick']:4d} | {phi_ab:+.4f} | {sync:>5} | {ops}")
+    print("\n".join(rows))
+
+    r0 = vm.registers["r0"].read_slot(0)
+    r1 = vm.registers["r1"].read_slot(0)
+    # I registri della VM sono float64 (banco vm.reg_slots)
+    print(f"\n  Final: r0={r0:g} (sync-gated), r1={r1:g} (ungated)")
+    print(f"  Ratio: r0 advanced {r0 // 10:g} times in {r1:g} ticks")
+
+    # run(N) in blocco (kernel compilato) deve dare lo stesso log di N step()
+    alu_program = [
+        PhaseInstruction.alu("add", (3.1, 2.7), "ab", 0.0, 0.6),
+        PhaseInstruction.alu("mul", (3.3, 2.9), "ao", 0.2, 0.7),
+        PhaseInstruction.alu("phase_hash", (12345,), "bo", 0.0, 0.5),
+    ]
+    n_ticks = 6000
+    vm_step = TriphaseVM(simple_system(4.0, 1.0, 13.0))
+    vm_run = TriphaseVM(simple_system(4.0, 1.0, 13.0))
+    vm_step.load_program(alu_program)
+    vm_run.load_program(alu_program)
+    for _ in range(n_ticks):
+        vm_step.step()
+    vm_run.run(n_ticks)
+    same = vm_run.log.to_dicts() == vm_step.log.to_dicts()
+    print(f"\n  run({n_ticks}) == {n_ticks} x step(): {same}")
+    assert same, "run() e step() divergono"
 
 
 # =============================================================================
@@ -277,6 +322,10 @@ def test_vm_demo():
 # =============================================================================
 
 if __name__ == "__main__":
+    # Block-buffer stdout even on a terminal: the tables are written in a
+    # handful of large writes instead of one flush per line
+    sys.stdout.reconfigure(line_buffering=False)
+
     print("╔══════════════════════════════════════════════════════════╗")
     print("║  TRIPHASE COMPUTATION — Practical Benchmark Suite       ║")
     print("║  Paradigms 2 (Phase-Weighted) + 3 (Phase-Encoded)       ║")
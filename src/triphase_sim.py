@@ -12,17 +12,106 @@ Author: Alessio Cazzaniga
 """
 
 import math
+from collections.abc import Sequence
 from dataclasses import dataclass, field
+from fractions import Fraction
+from functools import lru_cache
 from typing import Callable, Optional
 
+import numpy as np
+
+try:
+    from numba import cuda, njit, prange
+    HAVE_NUMBA = True
+except ImportError:  # Numba è opzionale: senza, i kernel restano Python puro
+    HAVE_NUMBA = False
+    cuda = None
+    prange = range
+
+    def njit(*args, **kwargs):
+        """Sostituto di numba.njit: restituisce la funzione invariata."""
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda fn: fn
+
+
+# =============================================================================
+# Kernels: aritmetica di fase (compilati con Numba se disponibile)
+# =============================================================================
+
+# Niente fastmath: i kernel devono dare gli stessi bit dei percorsi
+# Python/NumPy (contrazioni e riassociazioni cambierebbero l'ultimo bit)
+
+@njit('float64(float64, float64)', cache=True)
+def _phase_at(t, f):
+    """Fase normalizzata [0, 1) di un clock a frequenza f al tempo t."""
+    return (t * f) % 1.0
+
+
+@njit('float64(float64, float64)', cache=True)
+def _phase_rel(t, f_pair):
+    """
+    Fase relativa tra due clock, normalizzata [-0.5, 0.5).
+
+    f_pair è la differenza delle due frequenze: Φ_1 - Φ_2 = (f1 - f2)·t
+    a meno di un intero, quindi basta un solo prodotto e un solo wrap.
+    Un +0.5 esatto va a -0.5 (round() lo lasciava a +0.5).
+    """
+    x = t * f_pair
+    # Wrap senza round(): floor(x + 0.5) come divisione intera
+    n = (x + 0.5) // 1.0
+    if x < n - 0.5:
+        # x + 0.5 arrotondato all'intero successivo (x = 0.5 - 2**-54):
+        # il confronto è esatto, x - n arrotonderebbe a -0.5
+        n -= 1.0
+    return x - n
+
+
+@njit('int64(float64, float64, float64)', cache=True)
+def _phase_bits(phi_ab, phi_ao, phi_bo):
+    """Le tre fasi quantizzate a 8 bit, impacchettate in una parola (24 bit)."""
+    return ((int((phi_ab + 0.5) * 256) & 0xFF)
+            | (int((phi_ao + 0.5) * 256) & 0xFF) << 8
+            | (int((phi_bo + 0.5) * 256) & 0xFF) << 16)
+
+
+def _phase_bits_vec(phases: np.ndarray) -> np.ndarray:
+    """Come _phase_bits, sulla matrice (N, 3) delle fasi: array uint32."""
+    # SWAR: un byte per fase nelle corsie 0-2 di una parola little-endian
+    lanes = np.zeros((len(phases), 4), dtype=np.uint8)
+    lanes[:, :3] = ((phases + 0.5) * 256).astype(np.uint32)  # & 0xFF implicito
+    return lanes.view('<u4').ravel()
+
+
+# Tabella del seno su un giro di fase, indicizzata da int(phi * N) & (N - 1):
+# le fasi hanno comunque precisione limitata (8 bit in phase_hash)
+SIN_LUT_SIZE = 4096
+_SIN_LUT = np.sin(2 * np.pi * np.arange(SIN_LUT_SIZE) / SIN_LUT_SIZE)
+# Fattore di modulazione di mul, 1 + 0.5·sin, già calcolato per indice:
+# una lettura al posto di mul + add (stessi valori, bit per bit)
+_MUL_GAIN_LUT = 1.0 + 0.5 * _SIN_LUT
+_MUL_GAIN_LIST = _MUL_GAIN_LUT.tolist()  # per il percorso scalare: float Python
+
+
+def _phase_rel_vec(t: np.ndarray, f_pair) -> np.ndarray:
+    """Come _phase_rel, su un array di tempi (f_pair anche array, in broadcast)."""
+    x = t * f_pair
+    n = np.floor(x + 0.5)
+    n -= x < n - 0.5  # stesso caso limite di _phase_rel
+    return x - n
+
 
 # =============================================================================
 # Core: Clock Domains
 # =============================================================================
 
-@dataclass
+@dataclass(slots=True)
 class Clock:
-    """Un dominio di clock con frequenza fissa."""
+    """
+    Un dominio di clock con frequenza fissa.
+
+    Non è frozen: tick() fa avanzare il contatore _ticks.
+    """
     name: str
     frequency_hz: float
     _ticks: int = 0
@@ -33,67 +122,106 @@ class Clock:
 
     def phase_at(self, t: float) -> float:
         """Fase normalizzata [0, 1) al tempo t."""
-        return (t * self.frequency_hz) % 1.0
+        return _phase_at(t, self.frequency_hz)
 
     def tick(self) -> int:
         self._ticks += 1
         return self._ticks
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class TriphaseSystem:
     """
     Sistema a tre clock: Alpha, Beta, Observer.
 
     Alpha e Beta generano il battimento.
     Observer campiona e calcola.
+
+    Immutabile: le frequenze di coppia sono calcolate una volta,
+    alla costruzione.
     """
     alpha: Clock
     beta: Clock
     observer: Clock
+    # Frequenze di coppia in cache: ogni fase è un solo wrap di f_pair·t
+    _f_ab: float = field(init=False, repr=False, compare=False)
+    _f_ao: float = field(init=False, repr=False, compare=False)
+    _f_bo: float = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        fa = self.alpha.frequency_hz
+        fb = self.beta.frequency_hz
+        fo = self.observer.frequency_hz
+        # frozen: i campi derivati si impostano aggirando __setattr__
+        object.__setattr__(self, "_f_ab", fa - fb)
+        object.__setattr__(self, "_f_ao", fa - fo)
+        object.__setattr__(self, "_f_bo", fb - fo)
+
+    @property
+    def pair_frequencies(self) -> tuple:
+        """Frequenze di coppia (f_AB, f_AO, f_BO), nell'ordine di phase_vector."""
+        return (self._f_ab, self._f_ao, self._f_bo)
 
     def phase_ab(self, t: float) -> float:
         """Fase relativa Alpha-Beta, normalizzata [-0.5, 0.5)."""
-        delta = self.alpha.phase_at(t) - self.beta.phase_at(t)
-        # Wrap to [-0.5, 0.5)
-        return delta - round(delta)
+        return _phase_rel(t, self._f_ab)
 
     def phase_ao(self, t: float) -> float:
-        delta = self.alpha.phase_at(t) - self.observer.phase_at(t)
-        return delta - round(delta)
+        return _phase_rel(t, self._f_ao)
 
     def phase_bo(self, t: float) -> float:
-        delta = self.beta.phase_at(t) - self.observer.phase_at(t)
-        return delta - round(delta)
+        return _phase_rel(t, self._f_bo)
+
+    def phase_ab_vec(self, t: np.ndarray) -> np.ndarray:
+        """Come phase_ab, su un array di tempi."""
+        return _phase_rel_vec(t, self._f_ab)
+
+    def phase_ao_vec(self, t: np.ndarray) -> np.ndarray:
+        return _phase_rel_vec(t, self._f_ao)
+
+    def phase_bo_vec(self, t: np.ndarray) -> np.ndarray:
+        return _phase_rel_vec(t, self._f_bo)
 
     def phase_vector(self, t: float) -> tuple:
         """Vettore completo di fasi (Φ_AB, Φ_AO, Φ_BO)."""
         return (self.phase_ab(t), self.phase_ao(t), self.phase_bo(t))
 
+    def phase_vector_vec(self, t: np.ndarray) -> np.ndarray:
+        """Come phase_vector, su un array di tempi: matrice (N, 3)."""
+        return _phase_rel_vec(t[:, None], np.array(self.pair_frequencies))
+
     def beat_frequency_ab(self) -> float:
         """Frequenza di battimento Alpha-Beta."""
-        return abs(self.alpha.frequency_hz - self.beta.frequency_hz)
+        return abs(self._f_ab)
 
     def is_sync(self, t: float, threshold: float = 0.05) -> bool:
         """True se Alpha e Beta sono quasi in fase."""
         return abs(self.phase_ab(t)) < threshold
 
+    def is_sync_vec(self, t: np.ndarray, threshold: float = 0.05) -> np.ndarray:
+        """Come is_sync, su un array di tempi."""
+        return np.abs(self.phase_ab_vec(t)) < threshold
+
     def sync_points(self, t_start: float, t_end: float,
                     threshold: float = 0.05, resolution: int = 10000) -> list:
         """Trova i punti di sincronia in un intervallo."""
         dt = (t_end - t_start) / resolution
-        points = []
-        for i in range(resolution):
-            t = t_start + i * dt
-            if self.is_sync(t, threshold):
-                points.append(t)
-        return points
+        t = t_start + np.arange(resolution) * dt
+        return t[np.abs(self.phase_ab_vec(t)) < threshold].tolist()
 
 
 # =============================================================================
 # Execution Model: Phase-Gated Instructions
 # =============================================================================
 
+# Operazioni di PhaseWeightedALU utilizzabili da PhaseInstruction.alu();
+# l'indice è l'opcode usato dal kernel compilato della VM
+ALU_OPS = ("add", "mul", "phase_hash")
+OP_ADD, OP_MUL, OP_HASH = range(len(ALU_OPS))
+ALU_ARITY = {"add": 2, "mul": 2, "phase_hash": 1}  # numero di operandi
+PHASE_PAIRS = ("ab", "ao", "bo")
+
+
 @dataclass
 class PhaseInstruction:
     """
@@ -108,22 +236,81 @@ class PhaseInstruction:
     window_width: float        # ampiezza della finestra
     operation: Callable        # funzione da eseguire
     op_name: str = "nop"       # nome leggibile
-
-    def can_execute(self, system: TriphaseSystem, t: float) -> bool:
-        """L'istruzione può eseguire in questo istante?"""
-        if self.phase_pair == "ab":
-            phi = system.phase_ab(t)
-        elif self.phase_pair == "ao":
-            phi = system.phase_ao(t)
-        elif self.phase_pair == "bo":
-            phi = system.phase_bo(t)
-        else:
+    alu_op: Optional[str] = None  # operazione ALU pura, se costruita con alu()
+    operands: tuple = ()          # operandi costanti dell'operazione ALU
+    # Variante vettoriale pura: (vm, t, phases) -> array di esiti, con
+    # phases la matrice (N, 3) dei tick in cui l'istruzione scatta
+    operation_vec: Optional[Callable] = None
+    # Specializzazione risolta alla costruzione (e da bind()): indice in
+    # phase_vector, -1 se la coppia è sconosciuta, e semi-ampiezza
+    _pair_idx: int = field(default=-1, init=False, repr=False, compare=False)
+    _half_width: float = field(default=0.0, init=False,
+                               repr=False, compare=False)
+
+    @classmethod
+    def alu(cls, op: str, operands: tuple, phase_pair: str = "ab",
+            window_center: float = 0.0, window_width: float = 1.0,
+            op_name: Optional[str] = None) -> "PhaseInstruction":
+        """
+        Istruzione che esegue un'operazione della PhaseWeightedALU
+        ("add", "mul", "phase_hash") su operandi costanti.
+
+        Non ha effetti collaterali: la VM può valutarla in blocco.
+        """
+        if op not in ALU_OPS:
+            raise ValueError(f"operazione ALU sconosciuta: {op!r}")
+        operands = tuple(operands)
+        if len(operands) != ALU_ARITY[op]:
+            raise ValueError(f"{op}: numero di operandi {len(operands)} "
+                             f"invece di {ALU_ARITY[op]}")
+
+        # Metodi risolti una volta sulla classe, non a ogni esecuzione
+        alu_fn = getattr(PhaseWeightedALU, op)
+        alu_batch_fn = getattr(PhaseWeightedALU, op + "_batch")
+
+        def operation(vm, t):
+            return alu_fn(vm.alu, *operands, t, vm.phase_vector)
+
+        def operation_vec(vm, t, phases):
+            return alu_batch_fn(vm.alu, *operands, t, phases)
+
+        return cls(phase_pair, window_center, window_width, operation,
+                   op_name or op.upper(), alu_op=op, operands=operands,
+                   operation_vec=operation_vec)
+
+    def __post_init__(self):
+        self.bind()
+
+    def bind(self):
+        """
+        Risolve una volta sola la coppia di fase e la semi-ampiezza
+        (da richiamare se phase_pair o window_width cambiano dopo).
+        """
+        self._pair_idx = (PHASE_PAIRS.index(self.phase_pair)
+                          if self.phase_pair in PHASE_PAIRS else -1)
+        self._half_width = self.window_width / 2
+
+    def can_execute(self, phi_vec: tuple) -> bool:
+        """
+        L'istruzione può eseguire con questo vettore di fasi?
+
+        phi_vec è TriphaseSystem.phase_vector(t), calcolato una volta
+        per tick dalla VM. Una coppia sconosciuta non scatta mai.
+        """
+        if self._pair_idx < 0:
             return False
 
-        dist = abs(phi - self.window_center)
-        if dist > 0.5:
-            dist = 1.0 - dist
-        return dist <= self.window_width / 2
+        # Distanza circolare: min(d, 1 - d) al posto del ramo su d > 0.5
+        dist = abs(phi_vec[self._pair_idx] - self.window_center)
+        return min(dist, 1.0 - dist) <= self._half_width
+
+    def can_execute_vec(self, phases: np.ndarray) -> np.ndarray:
+        """Come can_execute, sulla matrice (N, 3) di phase_vector_vec."""
+        if self._pair_idx < 0:
+            return np.zeros(len(phases), dtype=bool)
+
+        dist = np.abs(phases[:, self._pair_idx] - self.window_center)
+        return np.minimum(dist, 1.0 - dist) <= self._half_width
 
 
 # =============================================================================
@@ -144,6 +331,11 @@ class PhaseSlot:
             return phi >= self.phase_start or phi < self.phase_end
 
 
+def _slot_mask(n: int) -> Optional[int]:
+    """Maschera n - 1 se n è potenza di due (i & mask == i % n), altrimenti None."""
+    return n - 1 if n > 0 and n & (n - 1) == 0 else None
+
+
 class PhaseRegister:
     """
     Registro a fase: contiene N valori multiplexati nel tempo.
@@ -152,50 +344,59 @@ class PhaseRegister:
     ciascuno accessibile solo nella propria finestra di fase.
 
     Densità informativa: log2(K) bit aggiuntivi per registro.
+
+    values, se dato, è la memoria degli slot (es. una riga del banco
+    TriphaseVM.reg_slots); altrimenti il registro ne crea una propria.
     """
-    def __init__(self, name: str, num_slots: int = 4):
+    def __init__(self, name: str, num_slots: int = 4, values=None):
         self.name = name
-        self.slots: list[PhaseSlot] = []
         self.num_slots = num_slots
-        # Crea slot uniformi
-        slot_width = 1.0 / num_slots
-        for i in range(num_slots):
-            self.slots.append(PhaseSlot(
-                value=0,
-                phase_start=i * slot_width,
-                phase_end=(i + 1) * slot_width
-            ))
+        # Slot uniformi di ampiezza 1/num_slots: l'indice dello slot si
+        # ricava direttamente dalla fase, senza scandire i confini
+        self.values = [0] * num_slots if values is None else values
+        self._mask = _slot_mask(num_slots)
+
+    @property
+    def slots(self) -> list[PhaseSlot]:
+        """Vista PhaseSlot dei valori (copie: scrivere con write/write_slot)."""
+        slot_width = 1.0 / self.num_slots
+        return [
+            PhaseSlot(value=v, phase_start=i * slot_width,
+                      phase_end=(i + 1) * slot_width)
+            for i, v in enumerate(self.values)
+        ]
+
+    def _index(self, phi: float) -> int:
+        i = int((phi % 1.0) * self.num_slots)
+        return i & self._mask if self._mask is not None else i % self.num_slots
 
     def read(self, phi: float) -> object:
         """Leggi il valore corrispondente alla fase corrente."""
-        phi_norm = phi % 1.0
-        for slot in self.slots:
-            if slot.is_valid(phi_norm):
-                return slot.value
-        return None
+        return self.values[self._index(phi)]
 
     def write(self, phi: float, value: object):
         """Scrivi nel slot corrispondente alla fase corrente."""
-        phi_norm = phi % 1.0
-        for slot in self.slots:
-            if slot.is_valid(phi_norm):
-                slot.value = value
-                return True
-        return False
+        self.values[self._index(phi)] = value
+        return True
+
+    def read_slot(self, index: int) -> object:
+        """Leggi direttamente uno slot per indice."""
+        return self.values[index]
 
     def write_slot(self, index: int, value: object):
         """Scrivi direttamente in uno slot per indice."""
-        if 0 <= index < len(self.slots):
-            self.slots[index].value = value
+        if 0 <= index < self.num_slots:
+            self.values[index] = value
 
     def density_bits(self) -> float:
         """Bit aggiuntivi di densità informativa."""
         return math.log2(self.num_slots)
 
     def dump(self) -> dict:
+        slot_width = 1.0 / self.num_slots
         return {
-            f"slot_{i} [{s.phase_start:.2f}-{s.phase_end:.2f})": s.value
-            for i, s in enumerate(self.slots)
+            f"slot_{i} [{i * slot_width:.2f}-{(i + 1) * slot_width:.2f})": v
+            for i, v in enumerate(self.values)
         }
 
 
@@ -215,35 +416,474 @@ class PhaseWeightedALU:
     def __init__(self, system: TriphaseSystem):
         self.system = system
 
-    def add(self, a: float, b: float, t: float) -> float:
+    # phases, se dato, è il vettore di fasi al tempo t già noto al
+    # chiamante (per la VM: TriphaseVM.phase_vector del tick corrente)
+
+    def add(self, a: float, b: float, t: float,
+            phases: Optional[tuple] = None) -> float:
         """Addizione pesata dalla fase AB."""
-        phi = self.system.phase_ab(t)
+        phi = self.system.phase_ab(t) if phases is None else phases[0]
         return a + b * (1.0 + phi)
 
-    def mul(self, a: float, b: float, t: float) -> float:
+    def mul(self, a: float, b: float, t: float,
+            phases: Optional[tuple] = None) -> float:
         """Moltiplicazione modulata dalla fase AO."""
-        phi = self.system.phase_ao(t)
-        return a * b * (1.0 + 0.5 * math.sin(2 * math.pi * phi))
+        phi = self.system.phase_ao(t) if phases is None else phases[1]
+        return a * b * _MUL_GAIN_LIST[int(phi * SIN_LUT_SIZE) & (SIN_LUT_SIZE - 1)]
 
-    def phase_hash(self, x: int, t: float) -> int:
+    def phase_hash(self, x: int, t: float,
+                   phases: Optional[tuple] = None) -> int:
         """Hash che include la fase corrente — non riproducibile senza timing."""
-        phi_ab, phi_ao, phi_bo = self.system.phase_vector(t)
-        phase_bits = int((phi_ab + 0.5) * 256) & 0xFF
-        phase_bits |= (int((phi_ao + 0.5) * 256) & 0xFF) << 8
-        phase_bits |= (int((phi_bo + 0.5) * 256) & 0xFF) << 16
-        return x ^ phase_bits
+        if phases is None:
+            phases = self.system.phase_vector(t)
+        return x ^ _phase_bits(*phases)
+
+    # Varianti batch: stesso calcolo su un array di tempi, in NumPy.
+    # phases, se dato, è la matrice (N, 3) di phase_vector_vec(t) già
+    # calcolata dal chiamante (la VM la materializza una volta per run)
+
+    def add_batch(self, a: float, b: float, t: np.ndarray,
+                  phases: Optional[np.ndarray] = None) -> np.ndarray:
+        """Come add, su un array di tempi."""
+        phi = self.system.phase_ab_vec(t) if phases is None else phases[:, 0]
+        return a + b * (1.0 + phi)
 
-    def phase_select(self, values: list, t: float) -> object:
+    def mul_batch(self, a: float, b: float, t: np.ndarray,
+                  phases: Optional[np.ndarray] = None) -> np.ndarray:
+        """Come mul, su un array di tempi."""
+        # Tutti i passaggi riusano un solo buffer (mai la matrice del chiamante)
+        buf = (self.system.phase_ao_vec(t) if phases is None
+               else np.array(phases[:, 1]))
+        buf *= SIN_LUT_SIZE
+        idx = buf.astype(np.int32)
+        idx &= SIN_LUT_SIZE - 1
+        np.take(_MUL_GAIN_LUT, idx, out=buf)
+        buf *= a * b
+        return buf
+
+    def phase_hash_batch(self, x: int, t: np.ndarray,
+                         phases: Optional[np.ndarray] = None) -> np.ndarray:
+        """Come phase_hash, su un array di tempi."""
+        if phases is None:
+            phases = self.system.phase_vector_vec(t)
+        bits = _phase_bits_vec(phases)
+        if -2 ** 63 <= x < 2 ** 63:
+            return np.int64(x) ^ bits
+        # Operando oltre i 64 bit: XOR su interi Python, come phase_hash
+        return np.array([x ^ b for b in bits.tolist()], dtype=object)
+
+    def phase_select(self, values: list, t: float,
+                     phases: Optional[tuple] = None) -> object:
         """Seleziona un valore dalla lista in base alla fase."""
-        phi = (self.system.phase_ab(t) + 0.5) % 1.0  # normalize to [0,1)
-        index = int(phi * len(values)) % len(values)
-        return values[index]
+        phi_ab = self.system.phase_ab(t) if phases is None else phases[0]
+        phi = (phi_ab + 0.5) % 1.0  # normalize to [0,1)
+        n = len(values)
+        index = int(phi * n)
+        # Con n potenza di due basta la maschera al posto del modulo
+        return values[index & (n - 1) if n & (n - 1) == 0 else index % n]
 
 
 # =============================================================================
 # Triphase Virtual Machine
 # =============================================================================
 
+# Firma esplicita: compilazione eager all'import (poi dalla cache), niente
+# inferenza dei tipi alla prima run(). Tutti gli array sono C-contigui;
+# boundscheck spento, aritmetica IEEE stretta (vedi sopra, niente fastmath).
+# I tick sono indipendenti (fasi in forma chiusa, scritture sulla riga i):
+# il ciclo esterno è parallelo, senza riduzioni, quindi gli esiti non
+# dipendono dal numero di thread
+@njit('void(f8[::1], i4[::1], i4[::1], f8[::1], f8[::1], f8[::1], f8[::1], '
+      'f8[::1], f8[:, ::1], b1[:, ::1], f8[:, ::1])',
+      cache=True, boundscheck=False, error_model='numpy',
+      parallel=True)
+def _run_kernel(incs, op_codes, pair_idx, op_a, op_b, centers, half_widths,
+                ticks, phases, fired, results):
+    """
+    Esegue un programma di sole istruzioni ALU su tutti i tick.
+
+    Il programma è in forma SoA (un array per campo, vedi
+    TriphaseVM.load_program). Per ogni tick i scrive il vettore di fasi in
+    phases[i], e per ogni istruzione j se scatta (fired[i, j]) e
+    l'esito (results[i, j]). Le fasi sono quelle degli accumulatori della
+    VM: incs sono gli incrementi per tick, ticks gli indici dei tick.
+    """
+    inc_ab, inc_ao, inc_bo = incs[0], incs[1], incs[2]
+    for i in prange(ticks.shape[0]):
+        k = ticks[i]
+        phi_ab = _phase_rel(k, inc_ab)
+        phi_ao = _phase_rel(k, inc_ao)
+        phi_bo = _phase_rel(k, inc_bo)
+        phases[i, 0] = phi_ab
+        phases[i, 1] = phi_ao
+        phases[i, 2] = phi_bo
+        for j in range(op_codes.shape[0]):
+            p = pair_idx[j]
+            if p < 0:
+                fired[i, j] = False
+                continue
+            phi = phases[i, p]
+            dist = abs(phi - centers[j])
+            if min(dist, 1.0 - dist) > half_widths[j]:
+                fired[i, j] = False
+                continue
+            fired[i, j] = True
+            op = op_codes[j]
+            if op == OP_ADD:
+                results[i, j] = op_a[j] + op_b[j] * (1.0 + phi_ab)
+            elif op == OP_MUL:
+                gain = _MUL_GAIN_LUT[int(phi_ao * SIN_LUT_SIZE) & (SIN_LUT_SIZE - 1)]
+                results[i, j] = op_a[j] * op_b[j] * gain
+            else:
+                results[i, j] = int(op_a[j]) ^ _phase_bits(phi_ab, phi_ao, phi_bo)
+
+
+class TickLog(Sequence):
+    """
+    Log dei tick della VM, in colonne NumPy.
+
+    Per ogni tick: numero (tick), tempo, vettore di fasi e sincronia.
+    Le istruzioni eseguite sono un record piatto (riga del tick,
+    istruzione, esito) ordinato per riga. I dict del formato storico
+    ({"tick", "time", "phases", "executed", "sync"}) sono costruiti
+    solo quando si indicizza il log o si chiama to_dicts().
+
+    Con capacity il log è un ring di dimensione fissa: restano solo gli
+    ultimi capacity tick, scritti nella posizione riga % capacity.
+    """
+    def __init__(self, capacity: Optional[int] = None):
+        if capacity is not None and capacity < 1:
+            raise ValueError("capacity del log deve essere >= 1")
+        self._capacity = capacity
+        cap = capacity or 0
+        self._start = 0      # riga assoluta del tick più vecchio ancora nel log
+        self._len = 0
+        self._tick = np.empty(cap, dtype=np.int64)
+        self._time = np.empty(cap)
+        self._phases = np.empty((cap, 3))
+        self._sync = np.empty(cap, dtype=bool)
+        # Righe assolute; i record prima di _exec_lo sono già usciti dal ring
+        self._exec_row = np.empty(0, dtype=np.int64)
+        self._exec_lo = 0
+        self._exec_instr: list = []
+        self._exec_result: list = []
+
+    @classmethod
+    def from_columns(cls, ticks: np.ndarray, times: np.ndarray,
+                     phases: np.ndarray, sync: np.ndarray,
+                     exec_rows: np.ndarray, exec_instrs: list,
+                     exec_results: list) -> "TickLog":
+        """Log costruito dalle colonne di un blocco di tick (senza copie)."""
+        log = cls()
+        log._len = len(times)
+        log._tick, log._time, log._phases, log._sync = ticks, times, phases, sync
+        log._exec_row = exec_rows
+        log._exec_instr, log._exec_result = exec_instrs, exec_results
+        return log
+
+    @property
+    def capacity(self) -> Optional[int]:
+        return self._capacity
+
+    def _column(self, arr: np.ndarray) -> np.ndarray:
+        """Colonna in ordine di tick (copia solo se il ring è avvolto)."""
+        if self._capacity is None:
+            return arr[:self._len]
+        p = self._start % self._capacity
+        if p + self._len <= self._capacity:
+            return arr[p:p + self._len]
+        return np.concatenate((arr[p:], arr[:p + self._len - self._capacity]))
+
+    @property
+    def ticks(self) -> np.ndarray:
+        return self._column(self._tick)
+
+    @property
+    def times(self) -> np.ndarray:
+        return self._column(self._time)
+
+    @property
+    def phases(self) -> np.ndarray:
+        return self._column(self._phases)
+
+    @property
+    def sync(self) -> np.ndarray:
+        return self._column(self._sync)
+
+    def _reserve(self, num_ticks: int, num_exec: int):
+        """Garantisce spazio per altri tick ed esecuzioni (crescita geometrica)."""
+        need = self._len + num_ticks
+        if self._capacity is None and need > len(self._time):
+            cap = max(need, 2 * len(self._time), 64)
+            for name in ("_tick", "_time", "_phases", "_sync"):
+                old = getattr(self, name)
+                new = np.empty((cap,) + old.shape[1:], dtype=old.dtype)
+                new[:self._len] = old[:self._len]
+                setattr(self, name, new)
+        num_done = len(self._exec_instr)
+        need = num_done + num_exec
+        if need > len(self._exec_row):
+            new = np.empty(max(need, 2 * len(self._exec_row), 64), dtype=np.int64)
+            new[:num_done] = self._exec_row[:num_done]
+            self._exec_row = new
+
+    def _evict(self):
+        """Scarta i tick oltre capacity (e, a blocchi, le loro esecuzioni)."""
+        excess = self._len - self._capacity
+        if excess <= 0:
+            return
+        self._start += excess
+        self._len = self._capacity
+        num_done = len(self._exec_instr)
+        lo = self._exec_lo
+        lo += int(np.searchsorted(self._exec_row[lo:num_done], self._start))
+        if 2 * lo > num_done:
+            # Compattazione ammortizzata: si sposta al più metà dei record
+            self._exec_row[:num_done - lo] = self._exec_row[lo:num_done]
+            del self._exec_instr[:lo]
+            del self._exec_result[:lo]
+            lo = 0
+        self._exec_lo = lo
+
+    def append(self, tick: int, time: float, phi_vec: tuple, sync: bool,
+               executed: list):
+        """Aggiungi un tick; executed è una lista di (istruzione, esito)."""
+        self._reserve(1, len(executed))
+        row = self._start + self._len
+        i = row % self._capacity if self._capacity else row
+        self._tick[i] = tick
+        self._time[i] = time
+        self._phases[i] = phi_vec
+        self._sync[i] = sync
+        num_done = len(self._exec_instr)
+        self._exec_row[num_done:num_done + len(executed)] = row
+        for instr, result in executed:
+            self._exec_instr.append(instr)
+            self._exec_result.append(result)
+        self._len += 1
+        if self._capacity:
+            self._evict()
+
+    def extend(self, other: "TickLog"):
+        """Accoda tutti i tick di un altro log."""
+        n = len(other)
+        # In un ring entrano solo gli ultimi capacity tick di other
+        skip = max(0, n - self._capacity) if self._capacity else 0
+        other_rows = other._exec_row[other._exec_lo:len(other._exec_instr)]
+        other_rows = other_rows - (other._start + skip)
+        first = int(np.searchsorted(other_rows, 0))
+        num_exec = len(other_rows) - first
+        self._reserve(n - skip, num_exec)
+        row = self._start + self._len
+        if self._capacity:
+            at = np.arange(row + skip, row + n) % self._capacity
+        else:
+            at = slice(row, row + n)
+        self._tick[at] = other.ticks[skip:]
+        self._time[at] = other.times[skip:]
+        self._phases[at] = other.phases[skip:]
+        self._sync[at] = other.sync[skip:]
+        num_done = len(self._exec_instr)
+        self._exec_row[num_done:num_done + num_exec] = other_rows[first:] + (row + skip)
+        lo = other._exec_lo + first
+        self._exec_instr.extend(other._exec_instr[lo:])
+        self._exec_result.extend(other._exec_result[lo:])
+        self._len += n
+        if self._capacity:
+            self._evict()
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._entry(i) for i in range(*index.indices(self._len))]
+        if index < 0:
+            index += self._len
+        if not 0 <= index < self._len:
+            raise IndexError("indice del tick fuori dal log")
+        return self._entry(index)
+
+    def _entry(self, i: int) -> dict:
+        row = self._start + i
+        if self._capacity:
+            i = row % self._capacity
+        lo = self._exec_lo
+        rows = self._exec_row[lo:len(self._exec_instr)]
+        lo, hi = (np.searchsorted(rows, (row, row + 1)) + lo).tolist()
+        return {
+            "tick": self._tick[i].item(),
+            "time": self._time[i].item(),
+            "phases": tuple(self._phases[i].tolist()),
+            "executed": [
+                {"op": instr.op_name, "phase_pair": instr.phase_pair,
+                 "result": result}
+                for instr, result in zip(self._exec_instr[lo:hi],
+                                         self._exec_result[lo:hi])
+            ],
+            "sync": self._sync[i].item(),
+        }
+
+    def records(self):
+        """
+        Itera il log come tuple (tick, time, phases, executed, sync),
+        con executed lista di (istruzione, esito): niente dict.
+        """
+        lo, num_done = self._exec_lo, len(self._exec_instr)
+        rows = self._exec_row[lo:num_done].tolist()
+        cur, row = lo, self._start
+        for tick, time, phi, sync in zip(self.ticks.tolist(), self.times.tolist(),
+                                         self.phases.tolist(), self.sync.tolist()):
+            end = cur
+            while end < num_done and rows[end - lo] == row:
+                end += 1
+            yield (tick, time, tuple(phi),
+                   list(zip(self._exec_instr[cur:end], self._exec_result[cur:end])),
+                   sync)
+            cur, row = end, row + 1
+
+    def to_dicts(self) -> list[dict]:
+        """Tutto il log nel formato storico, una lista di dict."""
+        return self[:]
+
+
+@lru_cache(maxsize=None)
+def _cuda_run_kernel():
+    """
+    Variante CUDA di _run_kernel (un thread per tick), compilata alla
+    prima richiesta solo con TriphaseVM(use_gpu=True).
+
+    Niente fastmath. NVVM però contrae comunque a*b + c in FMA: i prodotti
+    che finiscono in una somma passano da dmul_rn, mai fuso, così gli esiti
+    restano quelli di step(). Il simulatore CUDA non ha libdevice e non
+    contrae: lì basta il prodotto ordinario.
+    """
+    from numba import config
+    if config.ENABLE_CUDASIM:
+        def mul_rn(x, y):
+            return x * y
+    else:
+        from numba.cuda.libdevice import dmul_rn as mul_rn
+
+    @cuda.jit
+    def kernel(incs, op_codes, pair_idx, op_a, op_b, centers, half_widths,
+               ticks, phases, fired, results):
+        i = cuda.grid(1)
+        if i >= ticks.shape[0]:
+            return
+        k = ticks[i]
+        # Stesso wrap di _phase_rel: x - floor(x + 0.5), caso limite incluso
+        for p in range(3):
+            x = mul_rn(k, incs[p])
+            n = math.floor(x + 0.5)
+            if x < n - 0.5:
+                n -= 1.0
+            phases[i, p] = x - n
+        phi_ab, phi_ao, phi_bo = phases[i, 0], phases[i, 1], phases[i, 2]
+        for j in range(op_codes.shape[0]):
+            p = pair_idx[j]
+            if p < 0:
+                fired[i, j] = False
+                continue
+            dist = abs(phases[i, p] - centers[j])
+            if min(dist, 1.0 - dist) > half_widths[j]:
+                fired[i, j] = False
+                continue
+            fired[i, j] = True
+            op = op_codes[j]
+            if op == OP_ADD:
+                results[i, j] = op_a[j] + mul_rn(op_b[j], 1.0 + phi_ab)
+            elif op == OP_MUL:
+                gain = _MUL_GAIN_LUT[int(phi_ao * SIN_LUT_SIZE) & (SIN_LUT_SIZE - 1)]
+                results[i, j] = op_a[j] * op_b[j] * gain
+            else:
+                bits = ((int((phi_ab + 0.5) * 256) & 0xFF)
+                        | (int((phi_ao + 0.5) * 256) & 0xFF) << 8
+                        | (int((phi_bo + 0.5) * 256) & 0xFF) << 16)
+                results[i, j] = int(op_a[j]) ^ bits
+
+    return kernel
+
+
+# Thread per blocco del kernel CUDA
+CUDA_BLOCK_SIZE = 256
+
+# Blocco minimo di run() con log_capacity: un ring piccolo non riduce il
+# passo a pochi tick per volta
+MIN_RUN_BLOCK = 1024
+
+
+# Formule inline delle operazioni ALU per _codegen_step (arità in
+# ALU_ARITY): le stesse operazioni, nello stesso ordine, di PhaseWeightedALU
+_ALU_INLINE = {
+    "add": "{0} + {1} * (1.0 + phi_ab)",
+    "mul": (f"{{0}} * {{1}} * _mul_gain[int(phi_ao * {SIN_LUT_SIZE})"
+            f" & {SIN_LUT_SIZE - 1}]"),
+    "phase_hash": "{0} ^ _phase_bits(phi_ab, phi_ao, phi_bo)",
+}
+
+
+def _codegen_step(instructions: list[PhaseInstruction]) -> Callable:
+    """
+    Compila il programma in una funzione Python specializzata.
+
+    La funzione generata, (vm, t, phi_ab, phi_ao, phi_bo) -> lista di
+    (istruzione, esito), è codice lineare: una finestra di fase con le
+    costanti inline per istruzione, e le operazioni ALU espanse al posto
+    della chiamata. Le operazioni Python restano chiamate.
+    """
+    namespace = {"_mul_gain": _MUL_GAIN_LIST, "_phase_bits": _phase_bits}
+
+    def const(value, name: str) -> str:
+        # Letterale se il repr è esatto, altrimenti nome nel namespace
+        if type(value) is int or (type(value) is float and math.isfinite(value)):
+            return repr(value)
+        namespace[name] = value
+        return name
+
+    lines = ["def _compiled_step(vm, t, phi_ab, phi_ao, phi_bo):",
+             "    executed = []"]
+    for j, instr in enumerate(instructions):
+        if instr.phase_pair not in PHASE_PAIRS:
+            continue  # non scatta mai
+        namespace[f"instr_{j}"] = instr
+        inline = _ALU_INLINE.get(instr.alu_op)
+        if inline is not None and len(instr.operands) == ALU_ARITY[instr.alu_op]:
+            args = [const(v, f"arg_{j}_{i}") for i, v in enumerate(instr.operands)]
+            expr = inline.format(*args)
+        else:
+            namespace[f"op_{j}"] = instr.operation
+            expr = f"op_{j}(vm, t)"
+        center = const(instr.window_center, f"center_{j}")
+        half_width = const(instr.window_width / 2, f"half_width_{j}")
+        lines += [f"    d = abs(phi_{instr.phase_pair} - {center})",
+                  f"    if min(d, 1.0 - d) <= {half_width}:",
+                  f"        executed.append((instr_{j}, {expr}))"]
+    lines.append("    return executed")
+
+    exec(compile("\n".join(lines), "<triphase program>", "exec"), namespace)
+    return namespace["_compiled_step"]
+
+
+# Periodo massimo (in tick) per cui la VM precalcola la schedule periodica
+MAX_SCHEDULE_PERIOD = 4096
+
+
+@lru_cache(maxsize=64)
+def _select_schedule(inc_ab: float, n_values: int) -> list:
+    """
+    Indici di phase_select su un periodo di tick, per incremento AB diadico.
+
+    L'indice dipende solo dalla fase AB e da len(values): con inc_ab di
+    denominatore P (vedi TriphaseVM._fire_schedule) si ripete ogni P tick.
+    Elemento r = indice al tick k ≡ r (mod P), come PhaseWeightedALU.phase_select.
+    """
+    period = Fraction(inc_ab).denominator
+    k = np.arange(period, 2 * period, dtype=np.float64)
+    phi = (_phase_rel_vec(k, inc_ab) + 0.5) % 1.0
+    return ((phi * n_values).astype(np.int64) % n_values).tolist()
+
+
 class TriphaseVM:
     """
     Macchina virtuale trifasica.
@@ -252,65 +892,354 @@ class TriphaseVM:
     in un modello di esecuzione unificato.
     """
     def __init__(self, system: TriphaseSystem,
-                 num_registers: int = 8, slots_per_register: int = 4):
+                 num_registers: int = 8, slots_per_register: int = 4,
+                 use_gpu: bool = False, log_capacity: Optional[int] = None):
         self.system = system
+        # Offload su GPU (numba.cuda) dei programmi di sole istruzioni ALU
+        if use_gpu:
+            if not HAVE_NUMBA:
+                raise RuntimeError("use_gpu richiede Numba")
+            if not cuda.is_available():
+                raise RuntimeError("use_gpu: nessuna GPU CUDA disponibile")
+        self.use_gpu = use_gpu
         self.alu = PhaseWeightedALU(system)
+        # Banco registri SoA: una riga per registro, una colonna per slot.
+        # I PhaseRegister di self.registers sono viste sulle righe
+        self.slots_per_register = slots_per_register
+        self._slot_mask = _slot_mask(slots_per_register)
+        self.reg_slots = np.zeros((num_registers, slots_per_register))
+        self._reg_idx = {f"r{i}": i for i in range(num_registers)}
         self.registers = {
-            f"r{i}": PhaseRegister(f"r{i}", slots_per_register)
-            for i in range(num_registers)
+            name: PhaseRegister(name, slots_per_register, self.reg_slots[i])
+            for name, i in self._reg_idx.items()
         }
-        self.program: list[PhaseInstruction] = []
+        self._program: tuple[PhaseInstruction, ...] = ()
         self.pc = 0  # program counter
         self.time = 0.0
         self.dt = 1.0 / system.observer.frequency_hz  # observer tick period
-        self.log: list[dict] = []
+        # Fasi come accumulatori di tick: dopo k tick Φ = wrap(k * inc), con
+        # inc = wrap(f_pair * dt). Niente prodotti f * t di grande modulo,
+        # e la forma chiusa dà lo stesso valore a step(), NumPy e kernel
+        self._phase_inc = np.array([_phase_rel(self.dt, f)
+                                    for f in system.pair_frequencies])
+        self._phase_inc_list = self._phase_inc.tolist()  # per step()
+        # Gli stessi accumulatori in virgola fissa Q0.32, come Φ + 0.5 in
+        # [0, 1): solo se ogni incremento è esatto (denominatore che divide
+        # 2**32), così la versione intera coincide bit per bit con la float
+        self._phase_inc_q: Optional[tuple] = None
+        if all((2 ** 32) % Fraction(inc).denominator == 0
+               for inc in self._phase_inc_list):
+            self._phase_inc_q = tuple(int(Fraction(inc) * 2 ** 32) & 0xFFFFFFFF
+                                      for inc in self._phase_inc_list)
+        # Periodo della fase AB, se abbastanza corto per _select_schedule
+        select_period = Fraction(self._phase_inc_list[0]).denominator
+        self._select_period = (select_period
+                               if select_period <= MAX_SCHEDULE_PERIOD else None)
+        self._tick = 0  # tick dall'origine delle fasi (t = 0)
+        self._phi_ab = self._phi_ao = self._phi_bo = 0.0
+        # log_capacity: tiene solo gli ultimi N tick (ring), memoria limitata
+        self.log = TickLog(log_capacity)
+        self._kernel_program: Optional[tuple] = None
+        self._schedule: Optional[tuple] = None
+        self._compiled_step = _codegen_step(self._program)
+
+    @property
+    def phase_vector(self) -> tuple:
+        """Vettore di fasi (Φ_AB, Φ_AO, Φ_BO) del tick corrente."""
+        return (self._phi_ab, self._phi_ao, self._phi_bo)
+
+    def _phase_vector_q(self) -> tuple:
+        """Fasi del tick corrente in Q0.32 (Φ + 0.5), forma chiusa sul tick."""
+        tick = self._tick
+        return tuple((tick * inc + 0x80000000) & 0xFFFFFFFF
+                     for inc in self._phase_inc_q)
+
+    def phase_hash(self, x: int) -> int:
+        """PhaseWeightedALU.phase_hash alla fase del tick corrente."""
+        if self._phase_inc_q is None:
+            return self.alu.phase_hash(x, self.time, self.phase_vector)
+        # Gli 8 bit alti di ogni fase Q0.32 sono la quantizzazione a 8 bit
+        q_ab, q_ao, q_bo = self._phase_vector_q()
+        return x ^ (q_ab >> 24 | (q_ao >> 24) << 8 | (q_bo >> 24) << 16)
+
+    def phase_select(self, values: list) -> object:
+        """PhaseWeightedALU.phase_select alla fase del tick corrente."""
+        period = self._select_period
+        if period is not None and self._tick < 2 ** 53 // period:
+            schedule = _select_schedule(self._phase_inc_list[0], len(values))
+            return values[schedule[self._tick % period]]
+        if self._phase_inc_q is None:
+            return self.alu.phase_select(values, self.time, self.phase_vector)
+        # Frazione -> indice senza float: (q * n) >> 32 è già in [0, n)
+        return values[(self._phase_vector_q()[0] * len(values)) >> 32]
+
+    def _advance_phases(self) -> tuple:
+        """Avanza gli accumulatori di fase di un tick."""
+        self._tick = tick = self._tick + 1
+        k = float(tick)
+        inc_ab, inc_ao, inc_bo = self._phase_inc_list
+        phase_rel = _phase_rel
+        self._phi_ab = phi_ab = phase_rel(k, inc_ab)
+        self._phi_ao = phi_ao = phase_rel(k, inc_ao)
+        self._phi_bo = phi_bo = phase_rel(k, inc_bo)
+        return (phi_ab, phi_ao, phi_bo)
 
     def load_program(self, instructions: list[PhaseInstruction]):
         self.program = instructions
         self.pc = 0
 
+    @property
+    def program(self) -> tuple[PhaseInstruction, ...]:
+        """
+        Programma caricato, in sola lettura (tupla): step() e run() ne usano
+        le forme compilate, rifatte a ogni assegnazione di vm.program.
+        """
+        return self._program
+
+    @program.setter
+    def program(self, instructions: list[PhaseInstruction]):
+        self._program = instructions = tuple(instructions)
+        for instr in instructions:
+            instr.bind()
+        self._kernel_program = self._compile_program(instructions)
+        self._schedule = self._fire_schedule(instructions)
+        self._compiled_step = _codegen_step(instructions)
+
+    @staticmethod
+    def _compile_program(instructions: list[PhaseInstruction]) -> Optional[tuple]:
+        """
+        Programma in forma SoA per _run_kernel, o None se il kernel non si
+        applica: Numba assente, istruzioni non ALU, o operandi hash che non
+        stanno esatti in un float64.
+        """
+        if not HAVE_NUMBA or not instructions:
+            return None
+        for instr in instructions:
+            if instr.alu_op is None:
+                return None
+            # Arità sbagliata (istruzione non costruita con alu()): la si
+            # lascia al percorso Python, che solleva TypeError
+            if len(instr.operands) != ALU_ARITY[instr.alu_op]:
+                return None
+            if instr.alu_op == "phase_hash" and not (
+                    isinstance(instr.operands[0], int)
+                    and abs(instr.operands[0]) < 2 ** 53):
+                return None
+        return (
+            np.array([ALU_OPS.index(i.alu_op) for i in instructions], dtype=np.int32),
+            np.array([PHASE_PAIRS.index(i.phase_pair) if i.phase_pair in PHASE_PAIRS
+                      else -1 for i in instructions], dtype=np.int32),
+            np.array([i.operands[0] for i in instructions], dtype=np.float64),
+            np.array([i.operands[1] if ALU_ARITY[i.alu_op] == 2 else 0.0
+                      for i in instructions], dtype=np.float64),
+            np.array([i.window_center for i in instructions], dtype=np.float64),
+            np.array([i.window_width / 2 for i in instructions], dtype=np.float64),
+        )
+
+    def _fire_schedule(self, instructions: list[PhaseInstruction]) -> Optional[tuple]:
+        """
+        Schedule periodica (periodo, fasi, bitmap delle finestre), o None.
+
+        Se ogni incremento di fase è una frazione diadica con denominatore
+        al più MAX_SCHEDULE_PERIOD (es. M1 Max: -1/2, -1/2, 0), k * inc è
+        esatto: fasi e finestre si ripetono identiche ogni P tick, con P
+        il denominatore massimo. Basta calcolarle su un periodo; le
+        finestre sono una bitmap np.packbits con una colonna per istruzione.
+        """
+        if not instructions:
+            return None
+        period = max(Fraction(inc).denominator for inc in self._phase_inc_list)
+        if period > MAX_SCHEDULE_PERIOD:
+            return None
+        # Riga r = tick k ≡ r (mod P), con k >= 1 come nei tick reali
+        # (k = 0 darebbe -0.0 al posto di 0.0 con incrementi negativi)
+        k = np.arange(period, 2 * period, dtype=np.float64)
+        phases = _phase_rel_vec(k[:, None], self._phase_inc)
+        fires = np.column_stack([instr.can_execute_vec(phases)
+                                 for instr in instructions])
+        return period, phases, np.packbits(fires, axis=0)
+
     def step(self) -> dict:
         """Esegui un tick dell'observer."""
-        self.time += self.dt
-        phi_vec = self.system.phase_vector(self.time)
+        # Alias locali: LOAD_FAST al posto delle catene di attributi
+        self.time = t = self.time + self.dt
+        phi_vec = self._advance_phases()
+        pc = self.pc
 
-        executed = []
-        for instr in self.program:
-            if instr.can_execute(self.system, self.time):
-                result = instr.operation(self, self.time)
-                executed.append({
-                    "op": instr.op_name,
-                    "phase_pair": instr.phase_pair,
-                    "result": result
-                })
+        # Programma specializzato da load_program (vedi _codegen_step)
+        executed = self._compiled_step(self, t, *phi_vec)
 
+        sync = abs(phi_vec[0]) < 0.05  # come is_sync()
+        self.log.append(pc, t, phi_vec, sync, executed)
         entry = {
-            "tick": self.pc,
-            "time": self.time,
+            "tick": pc,
+            "time": t,
             "phases": phi_vec,
-            "executed": executed,
-            "sync": self.system.is_sync(self.time)
+            "executed": [
+                {"op": instr.op_name, "phase_pair": instr.phase_pair,
+                 "result": result}
+                for instr, result in executed
+            ],
+            "sync": sync
         }
-        self.log.append(entry)
-        self.pc += 1
+        self.pc = pc + 1
         return entry
 
-    def run(self, num_ticks: int) -> list[dict]:
-        """Esegui N tick."""
-        results = []
-        for _ in range(num_ticks):
-            results.append(self.step())
-        return results
-
-    def read_reg(self, name: str) -> object:
+    def run(self, num_ticks: int) -> TickLog:
+        """
+        Esegui N tick e restituisci il loro log (accodato anche a self.log).
+
+        Fasi, finestre e sincronia sono valutate in blocco con NumPy su
+        tutti i tick; in Python restano solo le operazioni che scattano.
+
+        Con log_capacity i tick vanno a blocchi di capacity (almeno
+        MIN_RUN_BLOCK) e il log restituito tiene solo gli ultimi capacity:
+        la memoria resta limitata anche per N molto grandi.
+        """
+        if num_ticks <= 0:
+            return TickLog()
+        capacity = self.log.capacity
+        if capacity is None or num_ticks <= capacity:
+            return self._run_block(num_ticks)
+
+        block_size = max(capacity, MIN_RUN_BLOCK)
+        tail = TickLog(capacity)
+        for start in range(0, num_ticks, block_size):
+            tail.extend(self._run_block(min(block_size, num_ticks - start)))
+        return tail
+
+    def _run_block(self, num_ticks: int) -> TickLog:
+        """Un blocco di run(): tutti i tick valutati insieme."""
+        # Stessi tempi di N volte self.time += self.dt (cumsum è sequenziale)
+        steps = np.full(num_ticks + 1, self.dt)
+        steps[0] = self.time
+        t_arr = np.cumsum(steps)[1:]
+        k_arr = np.arange(self._tick + 1, self._tick + num_ticks + 1,
+                          dtype=np.float64)
+
+        # k * inc resta esatto finché |numeratore| * k < 2**53, con
+        # |numeratore| <= P / 2: la schedule vale fino a ~2**42 tick
+        schedule = self._schedule
+        if schedule is not None and self._tick + num_ticks < 2 ** 53 // schedule[0]:
+            phases, fires, vec_results = self._run_scheduled(t_arr)
+        elif self._kernel_program is not None and self.use_gpu:
+            phases, fires, vec_results = self._run_gpu(t_arr, k_arr)
+        elif self._kernel_program is not None:
+            phases, fires, vec_results = self._run_compiled(t_arr, k_arr)
+        else:
+            phases, fires, vec_results = self._run_vectorized(t_arr, k_arr)
+        sync = np.abs(phases[:, 0]) < 0.05  # come is_sync()
+
+        # Esecuzioni in ordine tick per tick, istruzione per istruzione,
+        # come in step(): solo le operazioni Python richiedono la VM al tick
+        exec_rows, exec_cols = np.nonzero(fires)
+        exec_instrs, exec_results = [], []
+        pc0, tick0, program = self.pc, self._tick, self.program
+        for k, j in zip(exec_rows.tolist(), exec_cols.tolist()):
+            instr = program[j]
+            if j in vec_results:
+                result = next(vec_results[j])
+            else:
+                self.time, self.pc = float(t_arr[k]), pc0 + k
+                self._tick = tick0 + k + 1
+                self._phi_ab, self._phi_ao, self._phi_bo = phases[k].tolist()
+                result = instr.operation(self, self.time)
+            exec_instrs.append(instr)
+            exec_results.append(result)
+
+        self.time, self.pc = float(t_arr[-1]), pc0 + num_ticks
+        self._tick = tick0 + num_ticks
+        self._phi_ab, self._phi_ao, self._phi_bo = phases[-1].tolist()
+        block = TickLog.from_columns(
+            pc0 + np.arange(num_ticks), t_arr, phases, sync,
+            exec_rows, exec_instrs, exec_results)
+        self.log.extend(block)
+        return block
+
+    def _run_vectorized(self, t_arr: np.ndarray, k_arr: np.ndarray) -> tuple:
+        """Fasi, maschere di esecuzione ed esiti vettoriali calcolati con NumPy."""
+        # Fasi materializzate una volta e condivise da tutte le istruzioni:
+        # il ciclo Python è sul programma (corto), non sui tick
+        phases = _phase_rel_vec(k_arr[:, None], self._phase_inc)
+        fires = np.column_stack([instr.can_execute_vec(phases)
+                                 for instr in self.program]
+                                or [np.zeros(len(t_arr), dtype=bool)])
+        return phases, fires, self._vec_results(t_arr, phases, fires)
+
+    def _run_scheduled(self, t_arr: np.ndarray) -> tuple:
+        """Come _run_vectorized, leggendo fasi e finestre dalla schedule periodica."""
+        period, period_phases, bitmap = self._schedule
+        rows = np.arange(self._tick + 1, self._tick + len(t_arr) + 1) % period
+        period_fires = np.unpackbits(bitmap, axis=0, count=period).view(bool)
+        phases, fires = period_phases[rows], period_fires[rows]
+        return phases, fires, self._vec_results(t_arr, phases, fires)
+
+    def _vec_results(self, t_arr: np.ndarray, phases: np.ndarray,
+                     fires: np.ndarray) -> dict:
+        """Esiti delle istruzioni con variante vettoriale, per indice."""
+        # Si calcolano in blocco sui tick in cui ciascuna scatta
+        vec_results = {}
+        for j, instr in enumerate(self.program):
+            if instr.operation_vec is not None:
+                mask = fires[:, j]
+                values = instr.operation_vec(self, t_arr[mask], phases[mask])
+                vec_results[j] = iter(np.asarray(values).tolist())
+        return vec_results
+
+    def _run_compiled(self, t_arr: np.ndarray, k_arr: np.ndarray) -> tuple:
+        """Come _run_vectorized, con un'unica chiamata a _run_kernel."""
+        # Colonne dal programma compilato: il kernel scrive solo quelle
+        num_ticks, num_instr = len(t_arr), len(self._kernel_program[0])
+        phases = np.empty((num_ticks, 3))
+        fires = np.empty((num_ticks, num_instr), dtype=np.bool_)
+        values = np.empty((num_ticks, num_instr))
+        _run_kernel(self._phase_inc, *self._kernel_program, k_arr,
+                    phases, fires, values)
+        return phases, fires, self._kernel_results(fires, values)
+
+    def _run_gpu(self, t_arr: np.ndarray, k_arr: np.ndarray) -> tuple:
+        """Come _run_compiled, con il kernel CUDA (un thread per tick)."""
+        num_ticks, num_instr = len(t_arr), len(self._kernel_program[0])
+        phases = cuda.device_array((num_ticks, 3))
+        fires = cuda.device_array((num_ticks, num_instr), dtype=np.bool_)
+        values = cuda.device_array((num_ticks, num_instr))
+        blocks = (num_ticks + CUDA_BLOCK_SIZE - 1) // CUDA_BLOCK_SIZE
+        _cuda_run_kernel()[blocks, CUDA_BLOCK_SIZE](
+            self._phase_inc, *self._kernel_program, k_arr,
+            phases, fires, values)
+        fires = fires.copy_to_host()
+        return (phases.copy_to_host(), fires,
+                self._kernel_results(fires, values.copy_to_host()))
+
+    def _kernel_results(self, fires: np.ndarray, values: np.ndarray) -> dict:
+        """Esiti del kernel per istruzione, sui soli tick in cui scatta."""
+        vec_results = {}
+        for j, instr in enumerate(self.program[:fires.shape[1]]):
+            column = values[fires[:, j], j]
+            if instr.alu_op == "phase_hash":
+                column = column.astype(np.int64)
+            vec_results[j] = iter(column.tolist())
+        return vec_results
+
+    def _reg_slot(self) -> int:
+        """Slot dei registri selezionato dalla fase AB corrente."""
+        phi = (self._phi_ab + 0.5) % 1.0
+        i = int(phi * self.slots_per_register)
+        if self._slot_mask is not None:
+            return i & self._slot_mask
+        return i % self.slots_per_register
+
+    def iter_log(self):
+        """Itera self.log come tuple (vedi TickLog.records), senza dict."""
+        return self.log.records()
+
+    def read_reg(self, name: str) -> float:
         """Leggi registro alla fase corrente."""
-        phi = (self.system.phase_ab(self.time) + 0.5) % 1.0
-        return self.registers[name].read(phi)
+        return self.reg_slots[self._reg_idx[name], self._reg_slot()]
 
-    def write_reg(self, name: str, value: object):
+    def write_reg(self, name: str, value: float):
         """Scrivi registro alla fase corrente."""
-        phi = (self.system.phase_ab(self.time) + 0.5) % 1.0
-        self.registers[name].write(phi, value)
+        self.reg_slots[self._reg_idx[name], self._reg_slot()] = value
 
 
 # =============================================================================